@@ -5,30 +5,212 @@ import os
 import re
 import logging
 from datetime import datetime
+from multiprocessing import Pool
+from multiprocessing.util import Finalize
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pymupdf
+except ImportError:
+    # Older PyMuPDF releases only ship the deprecated fitz name
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# PyPDF2 makes many small seeks and reads around the xref table, and the JSON writer many small writes; a large buffer turns them into far fewer syscalls
+_IO_BUFFER = 1 << 20
+
+_NOISE_RE = re.compile(r'^(?:\s*\d+\s*|\d{1,2}/\d{1,2}/\d{2,4})$')
+_NOISE_CHARS = str.maketrans('', '', '0123456789/')
+
+def _is_noise(line):
+    # Anything left after deleting ASCII digits and slashes rules out a page number or date without entering the regex
+    # engine, unless it is made of other \d characters (\d matches exactly what str.isdecimal accepts)
+    rest = line.translate(_NOISE_CHARS)
+    if rest and not rest.isdecimal():
+        return False
+    return _NOISE_RE.match(line) is not None
+
 def extract_text(page):
-    text = page.extract_text() or ""
-    return '\n'.join([line.strip() for line in text.split('\n') if len(line.strip()) > 2 and not re.match(r'^(\d+|\d{1,2}/\d{1,2}/\d{2,4})$', line.strip())])
+    return filter_text(page.extract_text() or "")
+
+def filter_text(text):
+    # Blank and single-line pages (covers, section breaks) skip the split/join round trip
+    if len(text) < 3:
+        return ""
+    if '\n' not in text:
+        line = text.strip()
+        return line if len(line) > 2 and not _is_noise(line) else ""
+    lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if len(line) > 2 and not _is_noise(line):
+            lines.append(line)
+    return '\n'.join(lines)
 
 def extract_images(page):
-    return ["[Image]"] if '/XObject' in page['/Resources'] and any(x['/Subtype'] == '/Image' for x in page['/Resources']['/XObject'].get_object().values()) else []
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources is not None else None
+    if xobjects is None:
+        return []
+    xobjects = xobjects.get_object()
+    # Walk the names and resolve each entry on demand rather than materializing .values() up front
+    return ["[Image]" for name in xobjects if xobjects[name].get_object().get('/Subtype') == '/Image']
+
+# Text backends only extract raw page text; images, metadata and outlines always come from PyPDF2
+class PyPDF2Backend:
+    def __init__(self, pdf_path, pages):
+        self.pages = pages
+
+    def page_text(self, page_num):
+        return self.pages[page_num].extract_text() or ""
+
+    def close(self):
+        pass
+
+class PyMuPDFBackend:
+    def __init__(self, pdf_path, pages):
+        self.doc = pymupdf.open(pdf_path)
+
+    def page_text(self, page_num):
+        return self.doc[page_num].get_text("text")
+
+    def close(self):
+        self.doc.close()
+
+class PDFiumBackend:
+    def __init__(self, pdf_path, pages):
+        self.doc = pypdfium2.PdfDocument(pdf_path)
+
+    def page_text(self, page_num):
+        page = self.doc[page_num]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self):
+        self.doc.close()
+
+BACKENDS = {'pypdf2': PyPDF2Backend, 'pymupdf': PyMuPDFBackend, 'pdfium': PDFiumBackend}
+
+def check_backend(backend):
+    if backend == 'pymupdf' and pymupdf is None:
+        raise ImportError("The 'pymupdf' backend requires PyMuPDF (pip install pymupdf)")
+    if backend == 'pdfium' and pypdfium2 is None:
+        raise ImportError("The 'pdfium' backend requires pypdfium2 (pip install pypdfium2)")
+
+_worker_file = None
+_worker_pages = None
+_worker_backend = None
+_worker_error = None
+
+def _init_worker(pdf_path, backend):
+    # Each worker parses its own reader; PyPDF2 readers and their file handles can't be shared across processes
+    global _worker_file, _worker_pages, _worker_backend, _worker_error
+    Finalize(None, _close_worker, exitpriority=10)
+    # An exception escaping a Pool initializer makes the pool respawn workers forever, so hand it to the first task instead
+    try:
+        _worker_file = open(pdf_path, 'rb', buffering=_IO_BUFFER)
+        _worker_pages = list(PyPDF2.PdfReader(_worker_file).pages)
+        _worker_backend = BACKENDS[backend](pdf_path, _worker_pages)
+    except Exception as e:
+        _worker_error = e
+
+def _close_worker():
+    if _worker_backend is not None:
+        _worker_backend.close()
+    if _worker_file is not None:
+        _worker_file.close()
+
+def _process_page(page_num):
+    if _worker_error is not None:
+        raise _worker_error
+    return filter_text(_worker_backend.page_text(page_num)), extract_images(_worker_pages[page_num])
+
+def extract_pages(reader, pdf_path, workers=1, backend='pypdf2', first=0):
+    check_backend(backend)
+    page_nums = range(first, len(reader.pages))
+    if workers > 1 and len(page_nums) > 1:
+        with Pool(min(workers, len(page_nums)), initializer=_init_worker, initargs=(pdf_path, backend)) as pool:
+            yield from pool.imap(_process_page, page_nums, chunksize=8)
+            # Let the workers exit normally so their finalizers close the PDF; leaving the block would terminate them
+            pool.close()
+            pool.join()
+    else:
+        pages = list(reader.pages)
+        text_backend = BACKENDS[backend](pdf_path, pages)
+        try:
+            for page_num in page_nums:
+                yield filter_text(text_backend.page_text(page_num)), extract_images(pages[page_num])
+        finally:
+            text_backend.close()
+
+def extract_chapters(reader, outlines, pdf_path, workers=1, backend='pypdf2'):
+    starts = [chapter['start_page'] for chapter in outlines]
+    ends = [start - 1 for start in starts[1:]] + [len(reader.pages) - 1]
+    # Front matter before the earliest outline entry belongs to no chapter, so it is never extracted
+    first = max(min(starts), 0)
+    pages = extract_pages(reader, pdf_path, workers, backend, first)
+    if min(starts) < 0 or starts != sorted(starts):
+        # Out-of-order or unresolved (-1) destinations can give overlapping ranges, so keep every page for random access
+        pages = list(pages)
+        for chapter, start, end in zip(outlines, starts, ends):
+            chapter_pages = [pages[p - first] for p in range(start, end + 1)]
+            yield dict(chapter, pages=[text for text, _ in chapter_pages], images=[image for _, images in chapter_pages for image in images])
+        return
+    # Ascending chapters tile the document, so pages are grouped straight off the ordered stream
+    chapters = iter(zip(outlines, starts, ends))
+    chapter, start, end = next(chapters)
+    pages_text, pages_images = [], []
+    for page_num, (text, images) in enumerate(pages, first):
+        while page_num > end:
+            yield dict(chapter, pages=pages_text, images=pages_images)
+            chapter, start, end = next(chapters)
+            pages_text, pages_images = [], []
+        pages_text.append(text)
+        pages_images.extend(images)
+    yield dict(chapter, pages=pages_text, images=pages_images)
+    for chapter, start, end in chapters:
+        yield dict(chapter, pages=[], images=[])
 
 def process_outlines(reader, outlines, level=0):
     chapters = []
-    for outline in outlines:
-        if isinstance(outline, list):
-            chapters.extend(process_outlines(reader, outline, level + 1))
-        else:
+    # get_destination_page_number walks the whole page tree per call, so map page object numbers to indices once up front
+    page_index = {page.indirect_reference.idnum: i for i, page in enumerate(reader.pages) if page.indirect_reference is not None}
+    # Depth-first walk with an explicit stack of iterators; a nested list suspends its parent so TOC order is preserved
+    stack = [(iter(outlines), level)]
+    while stack:
+        items, level = stack[-1]
+        for outline in items:
+            if isinstance(outline, list):
+                stack.append((iter(outline), level + 1))
+                break
             try:
+                start_page = page_index.get(getattr(outline.page, 'idnum', None))
                 chapters.append({
                     'title': outline.title,
                     'level': level,
-                    'start_page': reader.get_destination_page_number(outline)
+                    'start_page': start_page if start_page is not None else reader.get_destination_page_number(outline)
                 })
             except AttributeError:
                 continue
+        else:
+            stack.pop()
     return chapters
 
 def standardize_metadata(metadata):
@@ -38,33 +220,93 @@ def standardize_metadata(metadata):
     for key in ['CreationDate', 'ModDate']:
         if key in standardized and standardized[key].startswith('D:'):
             try:
-                standardized[key] = datetime.strptime(standardized[key][2:16], '%Y%m%d%H%M%S').isoformat() + 'Z'
+                # Slice the fixed D:YYYYMMDDHHmmSS fields instead of running strptime's format parser; truncated dates such as D:2023 raise ValueError and are left unchanged
+                date = standardized[key][2:16]
+                standardized[key] = datetime(int(date[0:4]), int(date[4:6]), int(date[6:8]),
+                                             int(date[8:10]), int(date[10:12]), int(date[12:14])).isoformat() + 'Z'
             except ValueError:
                 pass
     standardized.setdefault('Title', 'Untitled')
     standardized.setdefault('Author', 'Unknown')
     return standardized
 
-def pdf_to_json(pdf_path, json_path):
+class _JsonStreamWriter:
+    """Writes a top-level JSON object whose arrays are emitted one item at a time, so only the current item is held in memory."""
+
+    def __init__(self, file, indent=None):
+        self.file = file
+        self.indent = indent
+        self.separators = (',', ': ') if indent is not None else (',', ':')
+        # orjson only knows how to pretty-print with a two-space indent
+        self.use_orjson = orjson is not None and indent in (None, 2)
+        self.has_fields = False
+        self.has_items = False
+
+    def _newline(self, depth):
+        return b'\n' + b' ' * (self.indent * depth) if self.indent is not None else b''
+
+    def _dumps(self, obj, depth):
+        if self.use_orjson:
+            data = orjson.dumps(obj, option=(orjson.OPT_INDENT_2 if self.indent else 0) | orjson.OPT_NON_STR_KEYS)
+        else:
+            data = json.dumps(obj, indent=self.indent, separators=self.separators, ensure_ascii=False).encode('utf-8')
+        # Nested values are indented relative to their position in the enclosing document
+        return data.replace(b'\n', self._newline(depth))
+
+    def _begin_field(self, name):
+        self.file.write((b',' if self.has_fields else b'{') + self._newline(1) + json.dumps(name, ensure_ascii=False).encode('utf-8') + self.separators[1].encode())
+        self.has_fields = True
+
+    def write_field(self, name, value):
+        self._begin_field(name)
+        self.file.write(self._dumps(value, 1))
+
+    def begin_array(self, name):
+        self._begin_field(name)
+        self.file.write(b'[')
+        self.has_items = False
+
+    def write_item(self, obj):
+        self.file.write((b',' if self.has_items else b'') + self._newline(2) + self._dumps(obj, 2))
+        self.has_items = True
+
+    def end_array(self):
+        self.file.write(self._newline(1) + b']' if self.has_items else b']')
+
+    def close(self):
+        self.file.write(self._newline(0) + b'}' if self.has_fields else b'{}')
+
+def pdf_to_json(pdf_path, json_path, workers=1, backend='pypdf2', pretty=False):
     try:
-        with open(pdf_path, 'rb') as file:
+        check_backend(backend)
+        with open(pdf_path, 'rb', buffering=_IO_BUFFER) as file:
             reader = PyPDF2.PdfReader(file)
             metadata_dict = standardize_metadata(reader.metadata or {})
             outlines = process_outlines(reader, reader.outline) if reader.outline else []
-            
-            if outlines:
-                for i, chapter in enumerate(outlines):
-                    start, end = chapter['start_page'], (outlines[i + 1]['start_page'] - 1 if i < len(outlines) - 1 else len(reader.pages) - 1)
-                    chapter.update({'pages': [extract_text(reader.pages[p]) for p in range(start, end + 1)],
-                                    'images': sum([extract_images(reader.pages[p]) for p in range(start, end + 1)], [])})
-                json_data = {'metadata': metadata_dict, 'chapters': outlines}
-            else:
-                json_data = {'metadata': metadata_dict, 'content': [{'text': extract_text(p), 'images': extract_images(p)} for p in reader.pages]}
-
-            with open(json_path, 'w', encoding='utf-8') as json_file:
-                json.dump(json_data, json_file, indent=4, ensure_ascii=False)
+
+            # Stream into a temporary file beside the target and swap it in on success, so a failed run never leaves truncated JSON behind
+            tmp_path = f"{json_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb', buffering=_IO_BUFFER) as json_file:
+                    writer = _JsonStreamWriter(json_file, indent=2 if pretty else None)
+                    writer.write_field('metadata', metadata_dict)
+                    if outlines:
+                        writer.begin_array('chapters')
+                        for chapter in extract_chapters(reader, outlines, pdf_path, workers, backend):
+                            writer.write_item(chapter)
+                    else:
+                        writer.begin_array('content')
+                        for text, images in extract_pages(reader, pdf_path, workers, backend):
+                            writer.write_item({'text': text, 'images': images})
+                    writer.end_array()
+                    writer.close()
+                os.replace(tmp_path, json_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
             logging.info(f"Successfully converted {pdf_path} to {json_path}")
-    except (FileNotFoundError, PyPDF2.errors.PdfReadError) as e:
+    except (FileNotFoundError, ImportError, PyPDF2.errors.PdfReadError) as e:
         logging.error(f"Error processing {pdf_path}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
@@ -74,9 +316,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert a PDF file to JSON format")
     parser.add_argument("pdf_path", help="Path to the input PDF file")
     parser.add_argument("json_path", help="Path to the output JSON file")
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4), help="Number of processes used to extract pages")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default='pypdf2', help="Library used to extract page text")
+    parser.add_argument("--pretty", action="store_true", help="Indent the JSON output for readability")
     args = parser.parse_args()
 
     if os.path.exists(args.pdf_path) and args.pdf_path.lower().endswith('.pdf'):
-        pdf_to_json(args.pdf_path, args.json_path)
+        pdf_to_json(args.pdf_path, args.json_path, args.workers, args.backend, args.pretty)
     else:
         logging.error("Invalid file path or type")